@@ -1,5 +1,6 @@
 import asyncio
 import os
+from collections import deque
 from telethon.sync import TelegramClient
 from telethon.tl.functions.channels import InviteToChannelRequest
 from telethon.tl.functions.messages import AddChatUserRequest
@@ -17,6 +18,7 @@ import logging
 from dotenv import load_dotenv
 from datetime import datetime
 import json
+import sys
 
 # Load environment variables
 load_dotenv()
@@ -25,19 +27,96 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 logger = logging.getLogger(__name__)
 
+# Adaptive request delay bounds (seconds) and how many consecutive adds
+# are needed before the delay is relaxed
+MIN_REQUEST_DELAY = 1
+MAX_REQUEST_DELAY = 60
+DELAY_DECREASE_AFTER = 20
+
+
+# Bytes read from stdin by ainput() that are not yet part of a returned line
+_stdin_buffer = bytearray()
+
+
+def _normalize_phone(phone):
+    """Return phone with a leading '+', or None if it is empty"""
+    if not phone:
+        return None
+    return phone if phone.startswith("+") else "+" + phone
+
+
+async def ainput(prompt):
+    """input() that keeps the event loop running while waiting for the user
+
+    stdin is read in the loop itself once it becomes readable rather than in
+    a worker thread, since asyncio.run joins the executor on shutdown and a
+    thread blocked in input() would keep Ctrl+C waiting for Enter. Falls
+    back to a thread where stdin cannot be polled (Windows, regular files).
+    """
+    loop = asyncio.get_running_loop()
+    fd = sys.stdin.fileno()
+    readable = asyncio.Event()
+    try:
+        loop.add_reader(fd, readable.set)
+    except (NotImplementedError, OSError):
+        return await asyncio.to_thread(input, prompt)
+
+    print(prompt, end="", flush=True)
+    try:
+        while b"\n" not in _stdin_buffer:
+            readable.clear()
+            await readable.wait()
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                if not _stdin_buffer:
+                    raise EOFError
+                break
+            _stdin_buffer.extend(chunk)
+    finally:
+        loop.remove_reader(fd)
+
+    line, _, rest = bytes(_stdin_buffer).partition(b"\n")
+    _stdin_buffer[:] = rest
+    return line.decode(sys.stdin.encoding or "utf-8", "replace").rstrip("\r")
+
 
 class TelegramGroupManager:
     def __init__(self, api_id, api_hash, phone_number):
         self.api_id = api_id
         self.api_hash = api_hash
         self.phone_number = phone_number
-        self.client = TelegramClient("telegram", api_id, api_hash)
+        # Add-only workload: the client never needs to handle updates
+        self.client = TelegramClient(
+            "telegram", api_id, api_hash, receive_updates=False
+        )
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.logs_dir = "logs"
+        self._delay = None  # Seeded from the first add_members_to_group call
+        self._max_delay = MAX_REQUEST_DELAY
+        self._success_streak = 0
 
         # Create logs directory if it doesn't exist
         os.makedirs(self.logs_dir, exist_ok=True)
 
+    def _set_delay(self, delay):
+        if delay != self._delay:
+            logger.info("⏱️  Request delay %.1fs -> %.1fs", self._delay, delay)
+            self._delay = delay
+
+    def _on_flood_wait(self):
+        """Back off multiplicatively after a FloodWait"""
+        self._success_streak = 0
+        self._set_delay(
+            min(max(self._delay * 2, MIN_REQUEST_DELAY), self._max_delay)
+        )
+
+    def _on_success(self):
+        """Relax the delay a little after a run of successful adds"""
+        self._success_streak += 1
+        if self._success_streak >= DELAY_DECREASE_AFTER:
+            self._success_streak = 0
+            self._set_delay(max(self._delay * 0.9, MIN_REQUEST_DELAY))
+
     def log_failed_numbers(self, failed_entries):
         """Log failed numbers to a JSON file with timestamp"""
         if not failed_entries:
@@ -64,57 +143,54 @@ class TelegramGroupManager:
         await self.client.connect()
         if not await self.client.is_user_authorized():
             await self.client.send_code_request(self.phone_number)
-            code = input("📨 Enter the code sent to you in Telegram: ")
+            code = await ainput("📨 Enter the code sent to you in Telegram: ")
             await self.client.sign_in(self.phone_number, code)
         logger.info("✅ Successfully connected to Telegram")
 
     async def get_user_groups(self):
         """Fetch all groups and channels, filtering out duplicates"""
-        groups = []
-        groups_map = {}  # Track groups by title to filter duplicates
+        groups = {}  # Dialog id -> group, in display order
+        title_ids = {}  # Title -> ids of the groups listed under it
 
         async for dialog in self.client.iter_dialogs():
-            if dialog.is_group or dialog.is_channel:
+            is_channel = dialog.is_channel
+            if dialog.is_group or is_channel:
+                entity = dialog.entity
                 group_info = {
                     "id": dialog.id,
                     "title": dialog.name,
-                    "username": getattr(dialog.entity, "username", None),
-                    "entity": dialog.entity,
-                    "type": "📢 Channel" if dialog.is_channel else "👥 Group",
-                    "participants_count": getattr(
-                        dialog.entity, "participants_count", "N/A"
-                    ),
+                    "username": getattr(entity, "username", None),
+                    "entity": entity,
+                    "type": "📢 Channel" if is_channel else "👥 Group",
+                    "participants_count": getattr(entity, "participants_count", "N/A"),
                 }
 
                 # Use title as key to identify potential duplicates
                 title_key = group_info["title"].lower().strip()
+                ids = title_ids.get(title_key)
 
-                # If we already have a group with this title
-                if title_key in groups_map:
-                    existing_group = groups_map[title_key]
-
-                    # Prefer the group with a username over the one without
-                    if group_info["username"] and not existing_group["username"]:
-                        # Replace the existing group (without username) with this one (with username)
-                        # Remove the existing group from the list
-                        groups = [
-                            g for g in groups if g["title"].lower().strip() != title_key
-                        ]
-                        groups_map[title_key] = group_info
-                        groups.append(group_info)
-                    elif not group_info["username"] and existing_group["username"]:
-                        # Keep the existing group (with username), skip this one (without username)
-                        pass
-                    else:
-                        # Both have usernames or both don't, keep the first one
-                        if group_info not in groups:
-                            groups.append(group_info)
-                else:
+                if ids is None:
                     # First time seeing this group title
-                    groups_map[title_key] = group_info
-                    groups.append(group_info)
+                    groups[group_info["id"]] = group_info
+                    title_ids[title_key] = [group_info["id"]]
+                    continue
+
+                existing_group = groups[ids[0]]
+                if group_info["username"] and not existing_group["username"]:
+                    # Replace the groups without username with this one
+                    for group_id in ids:
+                        del groups[group_id]
+                    groups[group_info["id"]] = group_info
+                    title_ids[title_key] = [group_info["id"]]
+                elif not group_info["username"] and existing_group["username"]:
+                    # Keep the existing group (with username), skip this one
+                    pass
+                else:
+                    # Both have usernames or both don't, list both
+                    groups[group_info["id"]] = group_info
+                    ids.append(group_info["id"])
 
-        return groups
+        return list(groups.values())
 
     async def prompt_group_selection(self):
         """Show groups and let user pick one"""
@@ -133,8 +209,8 @@ class TelegramGroupManager:
             print()
 
         while True:
-            choice = input(
-                f"👉 Select a group (1-{len(groups)}), or 'q' to quit: "
+            choice = (
+                await ainput(f"👉 Select a group (1-{len(groups)}), or 'q' to quit: ")
             ).strip()
             if choice.lower() == "q":
                 return None
@@ -149,125 +225,218 @@ class TelegramGroupManager:
             print("❌ Invalid input, try again.")
 
     async def get_contacts_with_prefix(self, prefix, group_entity):
-        """Fetch contacts and filter by prefix, excluding existing group members"""
+        """Fetch contacts and filter by prefix, excluding existing group members
+
+        Returns a list of (phone, User) tuples so callers can reuse the
+        already-fetched User objects instead of resolving each phone again.
+        """
         result = await self.client(GetContactsRequest(hash=0))
         users = result.users  # type: ignore
 
-        # Fetch existing group participants
-        existing = await self.client.get_participants(group_entity)
-        existing_phones = {
-            (
-                "+" + p.phone
-                if p.phone and not p.phone.startswith("+")
-                else (p.phone or "")
-            )
-            for p in existing
-        }
+        # Stream existing group participants instead of buffering them all
+        existing_phones = set()
+        async for p in self.client.iter_participants(group_entity):
+            phone = _normalize_phone(p.phone)
+            if phone is not None:
+                existing_phones.add(phone)
+
+        phone_mode = bool(prefix) and prefix[0] in "+0123456789"
+        phone_prefix = _normalize_phone(prefix) if phone_mode else None
+        name_prefix = prefix.casefold()
 
-        filtered = []
+        # Keyed by phone so contacts sharing a number are only invited once
+        filtered = {}
         for c in users:
             if not isinstance(c, User):
                 continue
-            name = (c.first_name or "") + " " + (c.last_name or "")
-            phone = c.phone or ""
-            phone_fmt = "+" + phone if phone and not phone.startswith("+") else phone
+            phone_fmt = _normalize_phone(c.phone)
+            if phone_fmt is None or phone_fmt in existing_phones:
+                continue
 
-            if (
-                (name.lower().startswith(prefix.lower()) or phone.startswith(prefix))
-                and phone_fmt
-                and phone_fmt not in existing_phones
-            ):
-                filtered.append(phone_fmt)
+            if phone_mode:
+                matched = phone_fmt.startswith(phone_prefix)
+            else:
+                name = (c.first_name or "") + " " + (c.last_name or "")
+                matched = name.casefold().startswith(name_prefix)
+
+            if matched:
+                filtered.setdefault(phone_fmt, c)
+
+        return list(filtered.items())
+
+    async def add_members_to_group(
+        self, group_entity, phone_numbers, delay=5, concurrency=1
+    ):
+        """Add members to group
+
+        Each entry is either a phone number or a (phone, User) tuple as
+        returned by get_contacts_with_prefix; get_entity is only called
+        for entries without a known User.
+
+        Up to `concurrency` workers pull entries from a shared queue, each
+        waiting the current request delay after a successful add. `delay`
+        seeds that value on the first call; it then doubles on every
+        FloodWait and shrinks slowly after runs of successful adds. A
+        FloodWait also pauses every worker until the wait has elapsed and
+        the entry is retried.
+        """
+        total = len(phone_numbers)
+        if self._delay is None:
+            self._delay = delay
+            # Never back off below a configured delay above the usual cap
+            self._max_delay = max(MAX_REQUEST_DELAY, delay)
+
+        # Pick the invite request once for the whole batch
+        error = None
+        if isinstance(group_entity, Channel):
+            input_channel = utils.get_input_channel(group_entity)
+            if not input_channel:
+                error = "Invalid input channel"
+
+            async def invite_fn(user_entity):
+                return await self.client(
+                    InviteToChannelRequest(
+                        channel=input_channel,
+                        users=[utils.get_input_user(user_entity)],
+                    )
+                )
 
-        return filtered
+        elif isinstance(group_entity, Chat):
+            chat_id = group_entity.id
 
-    async def add_members_to_group(self, group_entity, phone_numbers, delay=5):
-        """Add members to group"""
-        successful, failed = [], []
-        for i, phone_number in enumerate(phone_numbers):
-            try:
-                logger.info(f"➡️  Processing {i+1}/{len(phone_numbers)}: {phone_number}")
-                try:
-                    user_entity = await self.client.get_entity(phone_number)
-                    if not isinstance(user_entity, User):
-                        raise ValueError("Entity is not a user")
-                except Exception as e:
-                    logger.error(f"❌ Could not resolve {phone_number}: {e}")
-                    failed.append(
-                        {
-                            "phone": phone_number,
-                            "error": str(e),
-                            "error_type": "ResolutionError",
-                        }
+            async def invite_fn(user_entity):
+                return await self.client(
+                    AddChatUserRequest(
+                        chat_id=chat_id,
+                        user_id=utils.get_input_user(user_entity),
+                        fwd_limit=50,
                     )
-                    continue
-
-                if isinstance(group_entity, Channel):
-                    input_channel = utils.get_input_channel(group_entity)
+                )
 
-                    if not input_channel:
-                        logger.error(f"❌ Invalid input channel")
-                        return
+        else:
+            error = "Unsupported group type"
 
-                    await self.client(
-                        InviteToChannelRequest(
-                            channel=input_channel,
-                            users=[utils.get_input_user(user_entity)],
-                        )
-                    )
-                elif isinstance(group_entity, Chat):
-                    await self.client(
-                        AddChatUserRequest(
-                            chat_id=group_entity.id,
-                            user_id=utils.get_input_user(user_entity),
-                            fwd_limit=50,
-                        )
-                    )
-                else:
-                    raise ValueError("Unsupported group type")
+        if error:
+            logger.error("❌ %s", error)
+            return [], [
+                {
+                    "phone": entry[0] if isinstance(entry, tuple) else entry,
+                    "error": error,
+                    "error_type": "ValueError",
+                }
+                for entry in phone_numbers
+            ]
+
+        loop = asyncio.get_running_loop()
+        queue = deque(enumerate(phone_numbers))
+        results = [None] * total
+        flood_cleared = asyncio.Event()
+        flood_cleared.set()
+        flood_until = 0.0  # Loop time at which the current FloodWait ends
+        stop = asyncio.Event()
+
+        async def add_one(i, entry):
+            if isinstance(entry, tuple):
+                phone_number, user_entity = entry
+            else:
+                phone_number, user_entity = entry, None
+
+            logger.info("➡️  Processing %d/%d: %s", i + 1, total, phone_number)
+            try:
+                if user_entity is None:
+                    user_entity = await self.client.get_entity(phone_number)
+                if not isinstance(user_entity, User):
+                    raise ValueError("Entity is not a user")
+            except FloodWaitError:
+                # Retried by the worker like an invite FloodWait
+                raise
+            except Exception as e:
+                logger.error("❌ Could not resolve %s: %s", phone_number, e)
+                return {
+                    "phone": phone_number,
+                    "error": str(e),
+                    "error_type": "ResolutionError",
+                }
 
-                successful.append(phone_number)
-                logger.info(f"✅ Added {phone_number}")
-                await asyncio.sleep(delay)
+            try:
+                await invite_fn(user_entity)
+                logger.info("✅ Added %s", phone_number)
+                self._on_success()
+                await asyncio.sleep(self._delay)
+                return phone_number
 
             except UserAlreadyParticipantError:
-                logger.info(f"ℹ️ {phone_number} is already a member")
-                successful.append(phone_number)
+                logger.info("ℹ️ %s is already a member", phone_number)
+                return phone_number
             except UserPrivacyRestrictedError as e:
-                failed.append(
-                    {
-                        "phone": phone_number,
-                        "error": str(e),
-                        "error_type": "PrivacyRestricted",
-                    }
-                )
-            except FloodWaitError as e:
-                logger.warning(f"⏳ Flood wait {e.seconds}s, retrying...")
-                await asyncio.sleep(e.seconds)
-                phone_numbers.insert(i, phone_number)
+                return {
+                    "phone": phone_number,
+                    "error": str(e),
+                    "error_type": "PrivacyRestricted",
+                }
             except (PeerFloodError, ChatAdminRequiredError) as e:
-                failed.append(
-                    {
-                        "phone": phone_number,
-                        "error": str(e),
-                        "error_type": type(e).__name__,
-                    }
-                )
-                break
-            except Exception as e:
-                failed.append(
-                    {
-                        "phone": phone_number,
+                stop.set()
+                return {
+                    "phone": phone_number,
+                    "error": str(e),
+                    "error_type": type(e).__name__,
+                }
+
+        async def wait_out_flood(seconds):
+            nonlocal flood_until
+            if flood_cleared.is_set():
+                # First FloodWait of this window: back off once
+                self._on_flood_wait()
+                flood_cleared.clear()
+            flood_until = max(flood_until, loop.time() + seconds)
+            # Other workers may push the deadline further while we sleep
+            while (remaining := flood_until - loop.time()) > 0:
+                await asyncio.sleep(remaining)
+            flood_cleared.set()
+
+        async def worker():
+            while queue and not stop.is_set():
+                await flood_cleared.wait()
+                if not queue or stop.is_set():
+                    break
+                i, entry = queue.popleft()
+                try:
+                    results[i] = await add_one(i, entry)
+                except FloodWaitError as e:
+                    logger.warning("⏳ Flood wait %ds, retrying...", e.seconds)
+                    queue.appendleft((i, entry))
+                    await wait_out_flood(e.seconds)
+                except Exception as e:
+                    results[i] = {
+                        "phone": entry[0] if isinstance(entry, tuple) else entry,
                         "error": str(e),
                         "error_type": type(e).__name__,
                     }
-                )
+
+        # Surface every FloodWait to the workers so they can pause together
+        # instead of Telethon sleeping inside a single request
+        flood_sleep_threshold = self.client.flood_sleep_threshold
+        self.client.flood_sleep_threshold = 0
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        finally:
+            self.client.flood_sleep_threshold = flood_sleep_threshold
+
+        successful, failed = [], []
+        for result in results:
+            if result is None:
+                # Skipped after a PeerFlood/ChatAdminRequired abort
+                continue
+            if isinstance(result, dict):
+                failed.append(result)
+            else:
+                successful.append(result)
 
         return successful, failed
 
     async def disconnect(self):
         if self.client.is_connected():
-            self.client.disconnect()
+            await self.client.disconnect()
 
 
 async def batch_add_members():
@@ -287,7 +456,9 @@ async def batch_add_members():
         if not group:
             return
 
-        prefix = input("🔍 Enter prefix to filter contacts (e.g. +2547, SW): ").strip()
+        prefix = (
+            await ainput("🔍 Enter prefix to filter contacts (e.g. +2547, SW): ")
+        ).strip()
         contacts = await manager.get_contacts_with_prefix(prefix, group)
 
         if not contacts:
@@ -302,7 +473,9 @@ async def batch_add_members():
         max_index = len(contacts) - 1
         while True:
             try:
-                start_index = int(input(f"📍 Enter start index (0 - {max_index}): "))
+                start_index = int(
+                    await ainput(f"📍 Enter start index (0 - {max_index}): ")
+                )
                 if 0 <= start_index <= max_index:
                     break
             except ValueError:
@@ -314,7 +487,7 @@ async def batch_add_members():
         while True:
             try:
                 amount = int(
-                    input(
+                    await ainput(
                         f"🔢 Enter how many contacts to process (max: {max_amount}): "
                     )
                 )
@@ -328,7 +501,7 @@ async def batch_add_members():
         contacts = contacts[start_index : start_index + amount]
 
         confirm = (
-            input(f"⚡ Proceed with adding {len(contacts)} contacts? (y/n): ")
+            (await ainput(f"⚡ Proceed with adding {len(contacts)} contacts? (y/n): "))
             .strip()
             .lower()
         )
@@ -338,12 +511,13 @@ async def batch_add_members():
         CHUNK_SIZE = int(os.getenv("TELEGRAM_CHUNK_SIZE", 10))
         CHUNK_DELAY = int(os.getenv("TELEGRAM_CHUNK_DELAY", 60))
         REQUEST_DELAY = int(os.getenv("TELEGRAM_REQUEST_DELAY", 3))
+        CONCURRENCY = int(os.getenv("TELEGRAM_CONCURRENCY", 1))
 
         all_successful, all_failed = [], []
         for i in range(0, len(contacts), CHUNK_SIZE):
             chunk = contacts[i : i + CHUNK_SIZE]
             success, fail = await manager.add_members_to_group(
-                group, chunk, delay=REQUEST_DELAY
+                group, chunk, delay=REQUEST_DELAY, concurrency=CONCURRENCY
             )
             all_successful.extend(success)
             all_failed.extend(fail)